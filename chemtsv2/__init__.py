@@ -0,0 +1,6 @@
+from rdkit import RDLogger
+
+# RDKit logs a message per problematic molecule, which is pure overhead when the MCTS
+# generates millions of candidates. Logging is turned off as soon as the package is
+# imported; the entry points re-enable it in debug mode.
+RDLogger.DisableLog("rdApp.*")
@@ -1,7 +1,11 @@
-import numpy as np
+import math
+
+# The scalers receive plain Python floats, so math.exp and explicit multiplication are
+# used instead of np.exp and ** to avoid the ufunc and power-operator dispatch per call.
 
 def gauss(x, a=1, mu=8, sigma=2):
-    return a * np.exp(-(x-mu)**2 / (2*sigma**2))
+    d = x - mu
+    return a * math.exp(-d*d / (2*sigma*sigma))
 
 
 def minmax(x, min, max):
@@ -12,14 +16,16 @@ def max_gauss(x, a=1, mu=8, sigma=2):
     if x > mu:
         return 1
     else :
-        return a * np.exp(-(x-mu)**2 / (2*sigma**2))
+        d = x - mu
+        return a * math.exp(-d*d / (2*sigma*sigma))
 
 
 def min_gauss(x, a=1, mu=2, sigma=2):
     if x < mu:
         return 1
     else :
-        return a * np.exp(-(x-mu)**2 / (2*sigma**2))
+        d = x - mu
+        return a * math.exp(-d*d / (2*sigma*sigma))
 
 
 def rectangular(x, min, max):
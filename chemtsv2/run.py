@@ -1,22 +1,21 @@
 import argparse
 from logging import getLogger, StreamHandler, FileHandler, Formatter, INFO, DEBUG
-from importlib import import_module
 import os
 import sys
 sys.path.append(os.getcwd())
 import pickle
-import re
-import requests
 import yaml
+try:
+    # The libyaml-based loader parses config files considerably faster than the pure-Python one.
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
 
 from numpy.random import default_rng
-from rdkit import RDLogger
-import tensorflow as tf
-tf.compat.v1.disable_eager_execution()
 
-from chemtsv2.mcts import MCTS, State
-from chemtsv2.utils import loaded_model, get_model_structure_info
-from chemtsv2.preprocessing import smi_tokenizer, selfies_tokenizer_from_smiles
+# TensorFlow, RDKit, and the modules that depend on them are imported inside main()
+# so that argument parsing and config validation do not pay their import cost, and so
+# that TensorFlow is imported only after CUDA_VISIBLE_DEVICES has been set.
 
 
 def get_parser():
@@ -135,31 +134,29 @@ def set_default_config(conf):
     
     
 
-def get_filter_modules(conf):
-    pat = re.compile(r'^use.*filter$')
-    module_list = []
-    for k, frag in conf.items():
-        if not pat.search(k) or frag != True:
-            continue
-        _k = k.replace('use_', '')
-        module_list.append(getattr(import_module(conf[_k]['module']), conf[_k]['class']))
-    return module_list
-
-
 def main():
     args = get_parser()
     with open(args.config, "r") as f:
-        conf = yaml.load(f, Loader=yaml.SafeLoader)
+        conf = yaml.load(f, Loader=YamlLoader)
     set_default_config(conf)
     os.makedirs(conf['output_dir'], exist_ok=True)
     os.environ['CUDA_VISIBLE_DEVICES'] = "-1" if args.gpu is None else args.gpu
 
+    from rdkit import RDLogger
+    import tensorflow as tf
+    tf.compat.v1.disable_eager_execution()
+
+    from chemtsv2.mcts import MCTS, State
+    from chemtsv2.utils import loaded_model, get_model_structure_info, get_class_from_module, get_filter_modules
+    from chemtsv2.preprocessing import smi_tokenizer, selfies_tokenizer_from_smiles
+
     # set log level
     conf["debug"] = args.debug
     log_level = DEBUG if args.debug else INFO
     logger = get_logger(log_level, conf["output_dir"])
-    if not args.debug:
-        RDLogger.DisableLog("rdApp.*")
+    if args.debug:
+        # RDKit logging is disabled when the chemtsv2 package is imported.
+        RDLogger.EnableLog("rdApp.*")
 
     if args.use_gpu_only_reward:
         logger.info("Use GPUs exclusively for reward caluculations")
@@ -173,6 +170,8 @@ def main():
         conf['fix_random_seed'] = True
 
     # download additional data if files don't exist
+    if not os.path.exists('data/sascorer.py') or not os.path.exists('data/fpscores.pkl.gz'):
+        import requests
     if not os.path.exists('data/sascorer.py'):
         url = 'https://raw.githubusercontent.com/rdkit/rdkit/master/Contrib/SA_Score/sascorer.py'
         with open('data/sascorer.py', 'w') as f:
@@ -183,9 +182,9 @@ def main():
             f.write(requests.get(url).content)
     
     rs = conf['reward_setting']
-    reward_calculator = getattr(import_module(rs["reward_module"]), rs["reward_class"])
+    reward_calculator = get_class_from_module(rs["reward_module"], rs["reward_class"])
     ps = conf['policy_setting']
-    policy_evaluator = getattr(import_module(ps['policy_module']), ps['policy_class'])
+    policy_evaluator = get_class_from_module(ps['policy_module'], ps['policy_class'])
     conf['max_len'], conf['rnn_vocab_size'], conf['rnn_output_size'] = get_model_structure_info(conf['model_setting']['model_json'], logger)
     model = loaded_model(conf['model_setting']['model_weight'], logger, conf)  #WM300 not tested  
     if args.input_smiles is not None:
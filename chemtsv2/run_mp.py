@@ -1,10 +1,8 @@
 import argparse
 from logging import getLogger, StreamHandler, FileHandler, Formatter, INFO, DEBUG
-from importlib import import_module
 import os
 os.environ['TF_CPP_MIN_LOG_LEVEL']='3'
 import pickle
-import re
 import sys
 sys.path.append(os.getcwd())
 
@@ -16,8 +14,13 @@ import tensorflow as tf
 tf.compat.v1.disable_eager_execution()
 import requests
 import yaml
+try:
+    # The libyaml-based loader parses config files considerably faster than the pure-Python one.
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
 
-from chemtsv2.utils import loaded_model, get_model_structure_info
+from chemtsv2.utils import loaded_model, get_model_structure_info, get_class_from_module, get_filter_modules
 from chemtsv2.parallel_mcts import p_mcts
 
 
@@ -113,17 +116,6 @@ def set_default_config(conf):
     conf.setdefault('use_selfies', False)
 
     
-def get_filter_modules(conf):
-    pat = re.compile(r'^use.*filter$')
-    module_list = []
-    for k, frag in conf.items():
-        if not pat.search(k) or frag != True:
-            continue
-        _k = k.replace('use_', '')
-        module_list.append(getattr(import_module(conf[_k]['module']), conf[_k]['class']))
-    return module_list
-
-
 def main():
     # Initialize MPI environment
     comm = MPI.COMM_WORLD
@@ -135,7 +127,7 @@ def main():
     
     args = get_parser()
     with open(args.config, 'r') as f:
-        conf = yaml.load(f, Loader=yaml.SafeLoader)
+        conf = yaml.load(f, Loader=YamlLoader)
     set_default_config(conf)
     os.makedirs(conf['output_dir'], exist_ok=True)
     os.environ['CUDA_VISIBLE_DEVICES'] = '-1' if args.gpu is None else args.gpu
@@ -143,10 +135,12 @@ def main():
     conf['debug'] = args.debug
     log_level = DEBUG if args.debug else INFO
     logger = get_logger(log_level, conf["output_dir"], rank)
-    if not conf['debug']:
+    if conf['debug']:
+        # RDKit logging is disabled when the chemtsv2 package is imported.
+        RDLogger.EnableLog("rdApp.*")
+    else:
         import warnings
         warnings.filterwarnings('ignore')
-        RDLogger.DisableLog("rdApp.*")
     if args.use_gpu_only_reward:
         logger.info("Use GPUs exclusively for reward caluculations")
         tf.config.set_visible_devices([], 'GPU')
@@ -174,7 +168,7 @@ def main():
     conf['max_len'], conf['rnn_vocab_size'], conf['rnn_output_size'] = get_model_structure_info(conf['model_setting']['model_json'], logger)
 
     rs = conf['reward_setting']
-    reward_calculator = getattr(import_module(rs['reward_module']), rs['reward_class'])
+    reward_calculator = get_class_from_module(rs['reward_module'], rs['reward_class'])
 
     if rank == 0:
         logger.info(f"========== Configuration ==========")
@@ -1,6 +1,8 @@
 import copy
-from functools import wraps
+from functools import lru_cache, wraps
+from importlib import import_module
 import itertools
+import re
 import sys
 import time
 
@@ -15,6 +17,24 @@ import selfies as sf
 from chemtsv2.misc.manage_qsub_parallel import run_qsub_parallel
 
 
+@lru_cache(maxsize=None)
+def get_class_from_module(module_name, class_name):
+    # Dynamically loaded classes (filters, rewards, policies) are resolved once and
+    # memoized, so repeated lookups skip the import machinery and getattr.
+    return getattr(import_module(module_name), class_name)
+
+
+def get_filter_modules(conf):
+    pat = re.compile(r'^use.*filter$')
+    module_list = []
+    for k, frag in conf.items():
+        if not pat.search(k) or frag != True:
+            continue
+        _k = k.replace('use_', '')
+        module_list.append(get_class_from_module(conf[_k]['module'], conf[_k]['class']))
+    return module_list
+
+
 def calc_execution_time(f):
     @wraps(f)
     def wrapper(*args, **kwargs):
@@ -156,6 +176,7 @@ def evaluate_node(new_compound, generated_dict, reward_calculator, conf, logger,
 
     valid_conf_list = []
     valid_mol_list = []
+    valid_canonical_smiles_list = []
     valid_filter_check_value_list = []
     dup_compound_info = {}
 
@@ -165,7 +186,7 @@ def evaluate_node(new_compound, generated_dict, reward_calculator, conf, logger,
         if mol is None:
             continue
         _mol = copy.deepcopy(mol)  # Chem.SanitizeMol() modifies `mol` in place
-        
+
         if Chem.SanitizeMol(_mol, catchErrors=True).name != 'SANITIZE_NONE':
             continue
 
@@ -178,12 +199,15 @@ def evaluate_node(new_compound, generated_dict, reward_calculator, conf, logger,
                 neutralize_atoms(mol)
             new_compound[i] = Chem.MolToSmiles(mol)
 
-        if new_compound[i] in generated_dict:
+        # `generated_dict` is keyed on canonical SMILES so that syntactically different
+        # strings for the same molecule do not trigger a redundant reward evaluation.
+        canonical_smiles = Chem.MolToSmiles(mol)
+        if canonical_smiles in generated_dict:
             dup_compound_info[i] = {
                 'valid_compound': new_compound[i],
-                'objective_values': generated_dict[new_compound[i]][0], 
+                'objective_values': generated_dict[canonical_smiles][0],
                 'generated_id': gids[i],
-                'filter_check': generated_dict[new_compound[i]][1]}
+                'filter_check': generated_dict[canonical_smiles][1]}
             continue
 
         if has_passed_through_filters(new_compound[i], conf):
@@ -204,6 +228,7 @@ def evaluate_node(new_compound, generated_dict, reward_calculator, conf, logger,
 
         valid_conf_list.append(_conf)
         valid_mol_list.append(mol)
+        valid_canonical_smiles_list.append(canonical_smiles)
         valid_filter_check_value_list.append(filter_check_value)
 
     if len(valid_mol_list) == 0: 
@@ -231,7 +256,7 @@ def evaluate_node(new_compound, generated_dict, reward_calculator, conf, logger,
     for i in range(len(valid_mol_list)):
         values = values_list[i]
         filter_check_value = valid_filter_check_value_list[i]
-        generated_dict[valid_compound[i]] = [values, filter_check_value]
+        generated_dict[valid_canonical_smiles_list[i]] = [values, filter_check_value]
     # add duplicate compounds' data if duplicated compounds are generated
     for k, v in sorted(dup_compound_info.items()):
         node_index.append(k)
@@ -1,133 +1,269 @@
+from functools import lru_cache
+import hashlib
 import os
-import pickle
 import sys
 
 import numpy as np
 import pandas as pd
 from rdkit import Chem
-from rdkit.Chem import AllChem
+from rdkit.Chem import AllChem, rdFingerprintGenerator
 sys.path.append("./data/")
 import sascorer
 
 from chemtsv2.misc.scaler import minmax, max_gauss, min_gauss, rectangular
 from chemtsv2.reward import Reward
+from reward.util import load_lgb_models
+
+# Treelite compiles the tree ensembles ahead of time, which is considerably faster than
+# LightGBM for the 1-row predictions issued from MCTS rollouts. It is optional; LightGBM
+# is used directly when it is not installed.
+try:
+    import treelite
+    import treelite_runtime
+    _TREELITE_AVAILABLE = True
+except ImportError:
+    _TREELITE_AVAILABLE = False
+
+# Numba is optional as well; the scalarization kernel falls back to numpy without it.
+try:
+    from numba import njit
+except ImportError:
+    njit = None
 
 LGB_MODELS_PATH = 'data/model/lgb_models.pickle'
+TREELITE_CACHE_DIR = 'data/model/treelite_cache'
 SURE_CHEMBL_ALERTS_PATH = 'data/sure_chembl_alerts.txt'
 CHEMBL_FPS_PATH = 'data/chembl_fps.npy'
-with open(LGB_MODELS_PATH, mode='rb') as models,\
-    open(SURE_CHEMBL_ALERTS_PATH, mode='rb') as alerts, \
+lgb_models = load_lgb_models(LGB_MODELS_PATH)
+with open(SURE_CHEMBL_ALERTS_PATH, mode='rb') as alerts, \
     open(CHEMBL_FPS_PATH, mode='rb') as fps:
-    lgb_models = pickle.load(models)
     smarts = pd.read_csv(alerts, header=None, sep='\t')[1].tolist()
     alert_mols = [Chem.MolFromSmarts(smart) for smart in smarts if Chem.MolFromSmarts(smart) is not None]
     chebml_fps = np.load(fps, allow_pickle=True).item()
 
 
-def scale_objective_value(params, value):
-    scaling = params["type"]
-    if scaling == "max_gauss":
-        return max_gauss(value, params["alpha"], params["mu"], params["sigma"])
-    elif scaling == "min_gauss":
-        return min_gauss(value, params["alpha"], params["mu"], params["sigma"])
-    elif scaling == "minmax":
-        return minmax(value, params["min"], params["max"])
-    elif scaling == "rectangular":
-        return rectangular(value, params["min"], params["max"])
-    elif scaling == "identity":
-        return value
-    else:
+def _compile_treelite_predictor(name, model):
+    booster = getattr(model, 'booster_', model)
+    model_hash = hashlib.md5(booster.model_to_string().encode()).hexdigest()[:16]
+    lib_path = os.path.join(TREELITE_CACHE_DIR, f'{name}_{model_hash}.so')
+    if not os.path.exists(lib_path):
+        os.makedirs(TREELITE_CACHE_DIR, exist_ok=True)
+        treelite_model = treelite.Model.from_lightgbm(booster)
+        # Export under a process-private name and publish atomically, so a parallel run
+        # compiling the same model never dlopens a partially written library.
+        tmp_path = os.path.join(TREELITE_CACHE_DIR, f'{name}_{model_hash}.tmp{os.getpid()}.so')
+        treelite_model.export_lib(toolchain='gcc', libpath=tmp_path, params={'parallel_comp': 1}, verbose=False)
+        os.replace(tmp_path, lib_path)
+    return treelite_runtime.Predictor(lib_path)
+
+
+# Passed through to LightGBM predict. pred_early_stop lets the predictor stop walking
+# the remaining trees once the accumulated score clears the margin. It is an
+# approximation that only affects classification-style boosters (LightGBM ignores it
+# for the regression models shipped here), so the default margin of 10.0 is deliberately
+# conservative. Quality-sensitive runs can tune or disable it from the run config:
+#
+#   lgb_predict_params: {pred_early_stop: False}
+LGB_PREDICT_KWARGS = {
+    'pred_early_stop': True,
+    'pred_early_stop_freq': 10,
+    'pred_early_stop_margin': 10.0,
+}
+
+
+def configure_lgb_predict_params(conf):
+    """Apply `lgb_predict_params` overrides from the run config."""
+    params = conf.get('lgb_predict_params')
+    if params:
+        LGB_PREDICT_KWARGS.update(params)
+
+
+def _make_predict_function(name):
+    model = lgb_models[name]
+    if _TREELITE_AVAILABLE:
+        try:
+            predictor = _compile_treelite_predictor(name, model)
+            return lambda fp: predictor.predict(treelite_runtime.DMatrix(np.asarray(fp, dtype=np.float32)))
+        except Exception as e:
+            print(f"[INFO] Treelite compilation failed for {name} ({e}). Falling back to LightGBM.")
+    return lambda fp: model.predict(fp, **LGB_PREDICT_KWARGS)
+
+
+lgb_predict = {name: _make_predict_function(name) for name in
+               ("EGFR", "ERBB2", "ABL", "SRC", "LCK", "PDGFRbeta", "VEGFR2", "FGFR1", "EPHB4",
+                "Sol", "Perm", "Meta", "Tox")}
+
+# All LightGBM objectives use the same Morgan fingerprint, so it is computed once per mol
+# and shared between them. The lru_cache additionally deduplicates mols that the MCTS
+# generates repeatedly, keyed on their canonical SMILES.
+_morgan_generator = rdFingerprintGenerator.GetMorganGenerator(radius=2, fpSize=2048)
+_last_mol = None
+_last_fp = None
+
+
+# Each cached row is a (1, 2048) float32 array (~8 KB), so the cache tops out around
+# 32 MB; a few thousand entries are enough to cover the revisit locality of the search.
+@lru_cache(maxsize=4096)
+def _fingerprint_from_smiles(smiles):
+    # float32 C-contiguous rows go into LightGBM and Treelite without another
+    # dtype conversion or copy inside predict.
+    return _morgan_generator.GetFingerprintAsNumPy(Chem.MolFromSmiles(smiles)).astype(np.float32).reshape(1, -1)
+
+
+def _get_fingerprint(mol):
+    global _last_mol, _last_fp
+    if mol is not _last_mol:
+        _last_fp = _fingerprint_from_smiles(Chem.MolToSmiles(mol))
+        _last_mol = mol
+    return _last_fp
+
+
+def _dscore_from_scaled(scaled_values, weights, inv_weight_sum):
+    # Weighted geometric mean in log space; one dot product instead of a Python loop.
+    # Callers guarantee scaled_values > 0, so np.log never warns here.
+    return float(np.exp(np.log(scaled_values) @ weights * inv_weight_sum))
+
+
+if njit is not None:
+    @njit(cache=True)
+    def _dscore_from_scaled(scaled_values, weights, inv_weight_sum):
+        log_sum = 0.0
+        for i in range(scaled_values.shape[0]):
+            log_sum += weights[i] * np.log(scaled_values[i])
+        return np.exp(log_sum * inv_weight_sum)
+
+
+# Scaling functions are resolved through this table instead of an if/elif cascade,
+# so each call is a single dict lookup.
+SCALING_FUNCTIONS = {
+    "max_gauss": lambda params, value: max_gauss(value, params["alpha"], params["mu"], params["sigma"]),
+    "min_gauss": lambda params, value: min_gauss(value, params["alpha"], params["mu"], params["sigma"]),
+    "minmax": lambda params, value: minmax(value, params["min"], params["max"]),
+    "rectangular": lambda params, value: rectangular(value, params["min"], params["max"]),
+    "identity": lambda params, value: value,
+}
+
+
+def _resolve_scaling_function(params):
+    try:
+        return SCALING_FUNCTIONS[params["type"]]
+    except KeyError:
         raise ValueError("Set the scaling function from one of 'max_gauss', 'min_gauss', 'minimax', rectangular, or 'identity'")
 
 
+def scale_objective_value(params, value):
+    return _resolve_scaling_function(params)(params, value)
+
+
+# Names of the objective functions in the order returned by get_objective_functions.
+OBJECTIVE_NAMES = ("EGFR", "ERBB2", "ABL", "SRC", "LCK", "PDGFRbeta", "VEGFR2", "FGFR1", "EPHB4",
+                   "Solubility", "Permeability", "Metabolic_stability", "Toxicity",
+                   "SAscore", "QED", "molecular_weight", "tox_alert", "has_chembl_substruct")
+
+# The Dscore_parameters dict is the same object for every reward call of a run, so the
+# per-objective scaling closures, the weight vector, and the inverse weight sum are
+# built once and reused until a different parameter object shows up.
+_cached_dscore_params = None
+_cached_dscore_setup = None
+
+
+def _prepare_dscore_setup(dscore_params):
+    global _cached_dscore_params, _cached_dscore_setup
+    if dscore_params is not _cached_dscore_params:
+        scale_fns = []
+        for objective in OBJECTIVE_NAMES:
+            params = dscore_params[objective]
+            scale_fn = _resolve_scaling_function(params)
+            if objective == "SAscore":
+                # SAscore is made negative when scaling because a smaller value is more desirable.
+                scale_fns.append(lambda value, params=params, scale_fn=scale_fn: scale_fn(params, -value))
+            else:
+                scale_fns.append(lambda value, params=params, scale_fn=scale_fn: scale_fn(params, value))
+        weights = np.array([dscore_params[objective]["weight"] for objective in OBJECTIVE_NAMES], dtype=np.float64)
+        _cached_dscore_setup = (scale_fns, weights, 1.0 / weights.sum())
+        _cached_dscore_params = dscore_params
+    return _cached_dscore_setup
+
+
 class Dscore_reward(Reward):
     def get_objective_functions(conf):
+        configure_lgb_predict_params(conf)
+
         def EGFR(mol):
             if mol is None:
-                return None
-            fp = [AllChem.GetMorganFingerprintAsBitVect(mol, 2, 2048)]
-            return lgb_models["EGFR"].predict(fp)[0]
+                return np.nan
+            return lgb_predict["EGFR"](_get_fingerprint(mol))[0]
 
         def ERBB2(mol):
             if mol is None:
-                return None
-            fp = [AllChem.GetMorganFingerprintAsBitVect(mol, 2, 2048)]
-            return lgb_models["ERBB2"].predict(fp)[0]
+                return np.nan
+            return lgb_predict["ERBB2"](_get_fingerprint(mol))[0]
 
         def ABL(mol):
             if mol is None:
-                return None
-            fp = [AllChem.GetMorganFingerprintAsBitVect(mol, 2, 2048)]
-            return lgb_models["ABL"].predict(fp)[0]
+                return np.nan
+            return lgb_predict["ABL"](_get_fingerprint(mol))[0]
 
         def SRC(mol):
             if mol is None:
-                return None
-            fp = [AllChem.GetMorganFingerprintAsBitVect(mol, 2, 2048)]
-            return lgb_models["SRC"].predict(fp)[0]
+                return np.nan
+            return lgb_predict["SRC"](_get_fingerprint(mol))[0]
 
         def LCK(mol):
             if mol is None:
-                return None
-            fp = [AllChem.GetMorganFingerprintAsBitVect(mol, 2, 2048)]
-            return lgb_models["LCK"].predict(fp)[0]
+                return np.nan
+            return lgb_predict["LCK"](_get_fingerprint(mol))[0]
 
         def PDGFRbeta(mol):
             if mol is None:
-                return None
-            fp = [AllChem.GetMorganFingerprintAsBitVect(mol, 2, 2048)]
-            return lgb_models["PDGFRbeta"].predict(fp)[0]
+                return np.nan
+            return lgb_predict["PDGFRbeta"](_get_fingerprint(mol))[0]
 
         def VEGFR2(mol):
             if mol is None:
-                return None
-            fp = [AllChem.GetMorganFingerprintAsBitVect(mol, 2, 2048)]
-            return lgb_models["VEGFR2"].predict(fp)[0]
+                return np.nan
+            return lgb_predict["VEGFR2"](_get_fingerprint(mol))[0]
 
         def FGFR1(mol):
             if mol is None:
-                return None
-            fp = [AllChem.GetMorganFingerprintAsBitVect(mol, 2, 2048)]
-            return lgb_models["FGFR1"].predict(fp)[0]
+                return np.nan
+            return lgb_predict["FGFR1"](_get_fingerprint(mol))[0]
 
         def EPHB4(mol):
             if mol is None:
-                return None
-            fp = [AllChem.GetMorganFingerprintAsBitVect(mol, 2, 2048)]
-            return lgb_models["EPHB4"].predict(fp)[0]
+                return np.nan
+            return lgb_predict["EPHB4"](_get_fingerprint(mol))[0]
 
         def Solubility(mol):
             if mol is None:
-                return None
-            fp = [AllChem.GetMorganFingerprintAsBitVect(mol, 2, 2048)]
-            return lgb_models["Sol"].predict(fp)[0]
+                return np.nan
+            return lgb_predict["Sol"](_get_fingerprint(mol))[0]
 
         def Permeability(mol):
             if mol is None:
-                return None
-            fp = [AllChem.GetMorganFingerprintAsBitVect(mol, 2, 2048)]
-            return lgb_models["Perm"].predict(fp)[0]
+                return np.nan
+            return lgb_predict["Perm"](_get_fingerprint(mol))[0]
 
         def Metabolic_stability(mol):
             if mol is None:
-                return None
-            fp = [AllChem.GetMorganFingerprintAsBitVect(mol, 2, 2048)]
-            return lgb_models["Meta"].predict(fp)[0]
+                return np.nan
+            return lgb_predict["Meta"](_get_fingerprint(mol))[0]
 
         def Toxicity(mol):
             if mol is None:
-                return None
-            fp = [AllChem.GetMorganFingerprintAsBitVect(mol, 2, 2048)]
-            return lgb_models["Tox"].predict(fp)[0]
+                return np.nan
+            return lgb_predict["Tox"](_get_fingerprint(mol))[0]
 
         def SAscore(mol):
             return sascorer.calculateScore(mol)
 
         def QED(mol):
-            try:
-                return Chem.QED.qed(mol)
-            except (Chem.rdchem.AtomValenceException, Chem.rdchem.KekulizeException):
-                return None
+            # QED kekulizes and adjusts hydrogens internally, which can fail on valence
+            # states that slipped through upstream checks; verify on a copy up front
+            # instead of catching the exceptions.
+            if Chem.SanitizeMol(Chem.Mol(mol), catchErrors=True).name != 'SANITIZE_NONE':
+                return np.nan
+            return Chem.QED.qed(mol)
 
         # The following three functions were taken from　https://github.com/jrwnter/mso.
         def molecular_weight(mol):
@@ -159,25 +295,19 @@ class Dscore_reward(Reward):
 
     def calc_reward_from_objective_values(values, conf):
 
-        if None in values:
+        # Invalid mols are flagged with NaN sentinels (None from older cached values is
+        # converted to NaN as well), so one vectorized isnan scan replaces the Python
+        # equality scan over the value list.
+        values = np.asarray(values, dtype=np.float64)
+        if np.isnan(values).any():
             return -1
 
-        dscore_params = conf["Dscore_parameters"]
-        objectives = [f.__name__ for f in Dscore_reward.get_objective_functions(conf)]
-
-        scaled_values = []
-        weights = []
-        for objective, value in zip(objectives, values):
-            if objective == "SAscore":
-                # SAscore is made negative when scaling because a smaller value is more desirable.
-                scaled_values.append(scale_objective_value(dscore_params[objective], -1 * value))
-            else:
-                scaled_values.append(scale_objective_value(dscore_params[objective], value))
-            weights.append(dscore_params[objective]["weight"])
-
-        multiplication_value = 1
-        for v, w in zip(scaled_values, weights):
-            multiplication_value *= v**w
-        dscore = multiplication_value ** (1/sum(weights))
-
-        return dscore
\ No newline at end of file
+        scale_fns, weights, inv_weight_sum = _prepare_dscore_setup(conf["Dscore_parameters"])
+        scaled_values = np.fromiter((scale_fn(value) for scale_fn, value in zip(scale_fns, values)),
+                                    dtype=np.float64, count=len(scale_fns))
+        # Any non-positive scaled objective drives the geometric mean to zero, so
+        # short-circuit here; the log-space kernel then never sees zero or negative
+        # input and needs no warning suppression.
+        if np.any(scaled_values <= 0.0):
+            return 0.0
+        return float(_dscore_from_scaled(scaled_values, weights, inv_weight_sum))
\ No newline at end of file
@@ -0,0 +1,136 @@
+import sys
+
+import joblib
+import numpy as np
+from rdkit import Chem
+from rdkit.Chem import AllChem, rdFingerprintGenerator
+sys.path.append("./data/")
+import sascorer
+
+from chemtsv2.reward import BatchReward
+from reward.dscore_reward import Dscore_reward, lgb_models, alert_mols, chebml_fps, LGB_PREDICT_KWARGS, configure_lgb_predict_params
+
+MORGAN_RADIUS = 2
+MORGAN_FP_SIZE = 2048
+_morgan_generator = rdFingerprintGenerator.GetMorganGenerator(radius=MORGAN_RADIUS, fpSize=MORGAN_FP_SIZE)
+
+# Batches smaller than this are fingerprinted serially; the joblib worker startup
+# costs more than it saves for the batch sizes of a typical MCTS expansion.
+FP_PARALLEL_MIN_BATCH = 64
+
+# The batch objective functions below are called one after another with the same list of mols,
+# so the fingerprint matrix of the current batch is computed once and shared between them.
+# The previous batch list is kept alive as the invalidation key; holding one small list
+# is harmless and an identity check is exact.
+_fp_matrix_mols = None
+_fp_matrix = None
+
+
+def _fingerprint_rows(mols):
+    return [_morgan_generator.GetFingerprintAsNumPy(mol) for mol in mols]
+
+
+def _compute_fingerprint_matrix(mols):
+    # The matrix is built as float32 C-contiguous so LightGBM's predict uses it
+    # without another dtype conversion or copy.
+    n_jobs = joblib.cpu_count()
+    if len(mols) < FP_PARALLEL_MIN_BATCH or n_jobs == 1:
+        fp_matrix = np.empty((len(mols), MORGAN_FP_SIZE), dtype=np.float32)
+        for i, mol in enumerate(mols):
+            fp_matrix[i] = _morgan_generator.GetFingerprintAsNumPy(mol)
+        return fp_matrix
+    chunk_size = -(-len(mols) // n_jobs)
+    chunks = [mols[i:i+chunk_size] for i in range(0, len(mols), chunk_size)]
+    row_chunks = joblib.Parallel(n_jobs=n_jobs)(
+        joblib.delayed(_fingerprint_rows)(chunk) for chunk in chunks)
+    return np.vstack([row for rows in row_chunks for row in rows]).astype(np.float32)
+
+
+def _predict_batch(name, mols, confs):
+    if confs:
+        configure_lgb_predict_params(confs[0])
+    return lgb_models[name].predict(_get_fingerprint_matrix(mols), **LGB_PREDICT_KWARGS)
+
+
+def _get_fingerprint_matrix(mols):
+    global _fp_matrix_mols, _fp_matrix
+    if _fp_matrix_mols is not mols:
+        _fp_matrix = _compute_fingerprint_matrix(mols)
+        _fp_matrix_mols = mols
+    return _fp_matrix
+
+
+class Dscore_reward_batch(BatchReward):
+    def get_batch_objective_functions():
+        def EGFR(mols, confs):
+            return _predict_batch("EGFR", mols, confs)
+
+        def ERBB2(mols, confs):
+            return _predict_batch("ERBB2", mols, confs)
+
+        def ABL(mols, confs):
+            return _predict_batch("ABL", mols, confs)
+
+        def SRC(mols, confs):
+            return _predict_batch("SRC", mols, confs)
+
+        def LCK(mols, confs):
+            return _predict_batch("LCK", mols, confs)
+
+        def PDGFRbeta(mols, confs):
+            return _predict_batch("PDGFRbeta", mols, confs)
+
+        def VEGFR2(mols, confs):
+            return _predict_batch("VEGFR2", mols, confs)
+
+        def FGFR1(mols, confs):
+            return _predict_batch("FGFR1", mols, confs)
+
+        def EPHB4(mols, confs):
+            return _predict_batch("EPHB4", mols, confs)
+
+        def Solubility(mols, confs):
+            return _predict_batch("Sol", mols, confs)
+
+        def Permeability(mols, confs):
+            return _predict_batch("Perm", mols, confs)
+
+        def Metabolic_stability(mols, confs):
+            return _predict_batch("Meta", mols, confs)
+
+        def Toxicity(mols, confs):
+            return _predict_batch("Tox", mols, confs)
+
+        def SAscore(mols, confs):
+            return [sascorer.calculateScore(mol) for mol in mols]
+
+        def QED(mols, confs):
+            # Same precheck as the per-mol Dscore_reward: QED kekulizes and adjusts
+            # hydrogens internally, so verify on a copy instead of catching exceptions.
+            return [np.nan if Chem.SanitizeMol(Chem.Mol(mol), catchErrors=True).name != 'SANITIZE_NONE'
+                    else Chem.QED.qed(mol) for mol in mols]
+
+        def molecular_weight(mols, confs):
+            return [Chem.Descriptors.MolWt(mol) for mol in mols]
+
+        def tox_alert(mols, confs):
+            return [0 if np.any([mol.HasSubstructMatch(alert) for alert in alert_mols]) else 1
+                    for mol in mols]
+
+        def has_chembl_substruct(mols, confs):
+            values = []
+            for mol in mols:
+                fp_query = AllChem.GetMorganFingerprint(mol, 1, useCounts=False)
+                if np.any([bit not in chebml_fps for bit in fp_query.GetNonzeroElements().keys()]):
+                    values.append(0)
+                else:
+                    values.append(1)
+            return values
+
+        return [EGFR, ERBB2, ABL, SRC, LCK, PDGFRbeta, VEGFR2, FGFR1, EPHB4, Solubility, Permeability, Metabolic_stability,
+                Toxicity, SAscore, QED, molecular_weight, tox_alert, has_chembl_substruct]
+
+
+    def calc_reward_from_objective_values(values, conf):
+        # The objective functions share their names and order with the per-mol Dscore_reward.
+        return Dscore_reward.calc_reward_from_objective_values(values, conf)
@@ -1,15 +1,13 @@
-import pickle
-
-from rdkit.Chem import AllChem
+from rdkit.Chem import rdFingerprintGenerator
 import numpy as np
 
 from chemtsv2.reward import Reward
+from reward.util import load_lgb_models
 
 
 LGB_MODELS_PATH = 'data/model/lgb_models.pickle'
-with open(LGB_MODELS_PATH, mode='rb') as f:
-    lgb_models = pickle.load(f)
-    print(f"[INFO] loaded model from {LGB_MODELS_PATH}")
+lgb_models = load_lgb_models(LGB_MODELS_PATH)
+morgan_generator = rdFingerprintGenerator.GetMorganGenerator(radius=2, fpSize=2048)
 
 
 class EGFR_reward(Reward):
@@ -17,7 +15,7 @@ class EGFR_reward(Reward):
         def EGFR(mol):
             if mol is None:
                 return None
-            fp = [AllChem.GetMorganFingerprintAsBitVect(mol, 2, 2048)]
+            fp = morgan_generator.GetFingerprintAsNumPy(mol).astype(np.float32).reshape(1, -1)
             return lgb_models["EGFR"].predict(fp)[0]
         return [EGFR]
 
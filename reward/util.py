@@ -1,6 +1,8 @@
 import os
+import pickle
 import random
 import re
+import shutil
 import string
 
 from rdkit import Chem
@@ -11,6 +13,41 @@ import numpy as np
 import subprocess
 
 
+def load_lgb_models(pickle_path):
+    """
+    Load a dict of LightGBM models, preferring native text dumps over the pickle.
+    On the first load the pickled models are converted with Booster.save_model to a
+    sibling directory; later loads read the text dumps directly, which is faster than
+    unpickling and independent of the LightGBM version the pickle was written with.
+    """
+    import lightgbm as lgb
+    native_dir = os.path.splitext(pickle_path)[0] + '_native'
+    if os.path.isdir(native_dir):
+        models = {os.path.splitext(file_name)[0]: lgb.Booster(model_file=os.path.join(native_dir, file_name))
+                  for file_name in sorted(os.listdir(native_dir)) if file_name.endswith('.txt')}
+        if models:
+            print(f"[INFO] loaded models from {native_dir}")
+            return models
+    with open(pickle_path, mode='rb') as f:
+        models = pickle.load(f)
+    print(f"[INFO] loaded models from {pickle_path}")
+    # Several MPI ranks (or qsub jobs sharing a work dir) can import a reward module at
+    # the same time, so the dumps are written to a private directory first and published
+    # with a single rename; a concurrent loader either sees the complete directory or
+    # falls back to the pickle, never a half-written text dump.
+    tmp_dir = f'{native_dir}.tmp{os.getpid()}'
+    os.makedirs(tmp_dir, exist_ok=True)
+    for name, model in models.items():
+        booster = getattr(model, 'booster_', model)
+        booster.save_model(os.path.join(tmp_dir, f'{name}.txt'))
+    try:
+        os.rename(tmp_dir, native_dir)
+    except OSError:
+        # Another process published the directory first; discard our copy.
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return models
+
+
 def read_reactions(reaction_file):
     reaction_df = pd.read_csv(reaction_file,header=None)
     reaction_list = [smarts for smarts in reaction_df[0]]